@@ -140,21 +140,50 @@ assert sys.version_info >= MIN_PYTHON, w.prnt('', f'{SCRIPT_NAME}\tpython {".".j
 OK  = w.WEECHAT_RC_OK
 ERR = w.WEECHAT_RC_ERROR
 
+# WeeChat version
+version = 0
+
 # Config file/options
 config_file     = ''  # Pointer
 config_option   = {}
-ignore_channels = []
-ignore_nicks    = []
+config_val      = {}  # Options values
+ignore_channels = frozenset()
+ignore_nicks    = frozenset()
+ignore_tags     = frozenset()
 
-# Dict with every nick on every channel, with its color and prefix as lookup values.
+# Dict with every nick on every channel, with a (color, prefix char, colored
+# prefix) tuple as lookup value.
 colored_nicks = {}
 
+# Dict of colored nick prefixes, keyed by (prefix char, color name); shared by
+# all nicks with the same prefix.
+colored_prefixes = {}
+
+# Dict of nick colors from weechat, keyed by nick; (server, nick) for the
+# 'irc_nick_color' info, and None for the own nick color.
+# Colors of nicks that are not in any buffer anymore are removed.
+nick_colors = {}
+
+# Dict of whether the buffer channel is an IRC channel, keyed by buffer.
+irc_channels = {}
+
+# Pointer of the timer hook that repopulates the colored nicks.
+populate_timer = ''
+
+# Set of (server, nick) removed from buffers, whose cached colors are evicted at
+# once by the timer hook; server is only set for the 'irc_nick_color' info.
+parted_nicks = set()
+evict_timer  = ''
+
+# Dict of how many nicks of a buffer start with each char, keyed by buffer.
+# It is updated one nick at a time on nicklist changes, so it never needs to be
+# rebuilt from all the buffer nicks.
+nick_first_chars = {}
+
 # Regexes
 
 RESET_RGX       = r'\034'
 RES_KEEP_RGX    = r'\031\034'                       # Reset color and keep attributes
-SPELL_MISS_RGX  = r'\031bF'                         # Misspelled end color (Spell plugin)
-EXACT_SPELL_RGX = rf'\A{SPELL_MISS_RGX}\Z'
 
 COLORS_RGX = r'''
                  \031
@@ -184,49 +213,52 @@ ATTR_RGX   = rf'''
                  |
                  {RES_KEEP_RGX}
              '''
-SPLIT_RGX  = rf'''
-                 ({COLORS_RGX})                     # Colors
-                 |
-                 ({ATTR_RGX})                       # Attributes
-                 |
-                 ({RESET_RGX})                      # Reset all
-                 |
-                 ({SPELL_MISS_RGX})
-                 |
-                                                    # Chars
-             '''
 
-HAS_COLORS_RGX  = rf'{COLORS_RGX} | {ATTR_RGX}'
-IS_COLOR_RGX    = rf'\A(?> {HAS_COLORS_RGX})\Z'
-EXACT_COLOR_RGX = rf'\A{COLORS_RGX}\Z'
+HAS_COLORS_RGX = rf'{COLORS_RGX} | {ATTR_RGX}'
+CODE_CHARS_RGX = r'[\031-\034]'                     # Chars that start codes
 
-# Horizontal whitespace
+# Horizontal whitespace chars
 # See https://en.wikipedia.org/wiki/Whitespace_character#Unicode.
-HORIZONTAL_WS     = r'\N{TAB}\N{SPACE}\N{NO-BREAK SPACE}\N{OGHAM SPACE MARK}\N{MONGOLIAN VOWEL SEPARATOR}\N{EN QUAD}\N{EM QUAD}\N{EN SPACE}\N{EM SPACE}\N{THREE-PER-EM SPACE}\N{FOUR-PER-EM SPACE}\N{SIX-PER-EM SPACE}\N{FIGURE SPACE}\N{PUNCTUATION SPACE}\N{THIN SPACE}\N{HAIR SPACE}\N{NARROW NO-BREAK SPACE}\N{MEDIUM MATHEMATICAL SPACE}\N{IDEOGRAPHIC SPACE}'
-HORIZONTAL_WS_RGX = rf'[{HORIZONTAL_WS}]++'
+# The string holds the chars themselves, not their regex escapes, so it works
+# both in regex char classes (VERBOSE mode keeps whitespace inside them) and in
+# plain str membership tests.
+HORIZONTAL_WS     = '\N{TAB}\N{SPACE}\N{NO-BREAK SPACE}\N{OGHAM SPACE MARK}\N{MONGOLIAN VOWEL SEPARATOR}\N{EN QUAD}\N{EM QUAD}\N{EN SPACE}\N{EM SPACE}\N{THREE-PER-EM SPACE}\N{FOUR-PER-EM SPACE}\N{SIX-PER-EM SPACE}\N{FIGURE SPACE}\N{PUNCTUATION SPACE}\N{THIN SPACE}\N{HAIR SPACE}\N{NARROW NO-BREAK SPACE}\N{MEDIUM MATHEMATICAL SPACE}\N{IDEOGRAPHIC SPACE}'
+
+# Because whitespace is the most common word divider, split words only on
+# horizontal whitespace, since vertical whitespace i.e. newline is used as
+# line terminator.
+# ASCII space (\x20) is the most common whitespace and is not valid in 'nicks'
+# on popular protocols like IRC and matrix; thus protocols that allow spaces
+# in 'nicks' are limited here.
+WORDS_RGX = rf'[^{HORIZONTAL_WS}]+'
 
 # Dict of regexes to compile.
 regex = {
         'colors':        COLORS_RGX,
         'attr':          ATTR_RGX,
         'reset':         RESET_RGX,
-        'split':         SPLIT_RGX,
         'has_colors':    HAS_COLORS_RGX,
-        'is_color':      IS_COLOR_RGX,
-        'exact_color':   EXACT_COLOR_RGX,
-        'horizontal_ws': HORIZONTAL_WS_RGX,
-        'exact_spell':   EXACT_SPELL_RGX,
+        'code_chars':    CODE_CHARS_RGX,
+        'words':         WORDS_RGX,
 }
 
 # Reset color code
 COLOR_RESET = w.color('reset')
 
+# Color codes chars for tokenize_colors(); see COLORS_RGX and ATTR_RGX.
+COLOR_CHAR  = '\x19'
+ATTR_CHARS  = ('\x1a', '\x1b')                # Set and remove attribute
+ATTRS       = tuple('\x01\x02\x03\x04\x05\x06')
+COLOR_ATTRS = tuple('*!/_%.|')                # IRC colors attributes
+RES_KEEP    = '\x19\x1c'                      # Reset color and keep attributes
+SPELL_MISS  = '\x19bF'                        # Misspelled end color (Spell plugin)
+
 # Space hex code
 SPACE = '\x20'
 
-# Unique escape codes
-UNIQ_ESC_NICK = '\36'  # Nick
-UNIQ_ESC_PREF = '\37'  # Prefix
+# IRC buffer types and message tags to colorize
+BUFTYPES     = frozenset(('channel', 'private'))
+PRIVMSG_TAGS = frozenset(('irc_privmsg', 'irc_notice'))
 
 def config_init():
     '''
@@ -437,26 +469,45 @@ def debug_str(var, string):
     w.prnt('', '')
 
 def get_nick_color(buffer, nick, my_nick):
-    ''' Retrieves nick color code from weechat. '''
+    ''' Retrieves nick color code from weechat.
+
+    The colors only depend on the nick (and its server for 'irc_nick_color'), and
+    weechat's nick colors options; so they are cached in nick_colors, until the
+    options change. Since there are few distinct colors, they are interned so all
+    nicks with the same color share one string. '''
 
     if nick == my_nick:
-        return w.color(w.config_string(w.config_get('weechat.color.chat_nick_self')))
-    else:
-        version = int(w.info_get('version_number', '') or 0)
+        if (nick_color := nick_colors.get(None)) is None:
+            nick_color = nick_colors[None] = w.color(w.config_string(w.config_get('weechat.color.chat_nick_self')))
+
+        return nick_color
+
+    # 'irc_nick_color' (deprecated since version 1.5, replaced by 'nick_color')
+    if version == 0x4010000 and w.buffer_get_string(buffer, 'plugin') == 'irc':
+        server = w.buffer_get_string(buffer, 'localvar_server')
+
+        if (nick_color := nick_colors.get((server, nick))) is None:
+            nick_color = nick_colors[server, nick] = sys.intern(w.info_get('irc_nick_color', f'{server},{nick}'))
 
-        # 'irc_nick_color' (deprecated since version 1.5, replaced by 'nick_color')
-        if w.buffer_get_string(buffer, 'plugin') == 'irc' and version == 0x4010000:
-            server = w.buffer_get_string(buffer, 'localvar_server')
-            return w.info_get('irc_nick_color', f'{server},{nick}')
+        return nick_color
 
-        return w.info_get('nick_color', nick)
+    if (nick_color := nick_colors.get(nick)) is None:
+        nick_color = nick_colors[nick] = sys.intern(w.info_get('nick_color', nick))
+
+    return nick_color
+
+def get_nick_prefix(prefix, prefix_color):
+    ''' Returns the nick prefix colored with the prefix_color name. '''
+
+    if (nick_prefix := colored_prefixes.get((prefix, prefix_color))) is None:
+        nick_prefix = colored_prefixes[prefix, prefix_color] = f'{w.color(prefix_color)}{prefix}'
+
+    return nick_prefix
 
 def colorize_priv_nicks(buffer):
     ''' Colorizes nicks on IRC private buffers. '''
 
-    # Reset the buffer dict to update nicks changes, since there is no nicklist
-    # in private buffers.
-    colored_nicks[buffer] = {}
+    nicks = {}
 
     my_nick   = w.buffer_get_string(buffer, 'localvar_nick')
     priv_nick = w.buffer_get_string(buffer, 'localvar_channel')
@@ -464,126 +515,236 @@ def colorize_priv_nicks(buffer):
     for nick in my_nick, priv_nick:
         nick_color = get_nick_color(buffer, nick, my_nick)
 
-        colored_nicks[buffer][nick] = {
-                'color':  nick_color,
-                'prefix': '',
-        }
+        nicks[nick] = (nick_color, '', '')
 
-def colorize_nicks(buffer, min_len, prefixes, suffixes, has_colors, line):
-    ''' Finds every nick from the dict of colored nicks, in the line and colorizes
-    them. '''
-
-    nicks_pat = rf'''
-                    [{prefixes}]?      # Optional prefix char
-                    (?P<nick> [^ ]++)
-                '''
-    nicks_rgx = re.compile(nicks_pat, flags=re.VERBOSE)
-    sfx_rgx   = re.compile(rf'[{suffixes}]$')
-
-    chop_line            = line
-    chop_match           = ''
-    chop_match_after     = ''
-    color_match          = ''
-    colorized_nicks_line = ''
-    nick_end             = COLOR_RESET
-
-    # Mark the nick's end with a unique escape to identify its position on preserve_colors().
-    if has_colors is not None:
-        nick_end = UNIQ_ESC_NICK
-
-    # Because whitespace is the most common word divider, split words only on
-    # horizontal whitespace, since vertical whitespace i.e. newline is used as
-    # line terminator.
-    # ASCII space (\x20) is the most common whitespace and is not valid in 'nicks'
-    # on popular protocols like IRC and matrix; thus protocols that allow spaces
-    # in 'nicks' are limited here.
-    for word in regex['horizontal_ws'].split(line.strip(f'{SPACE}')):
-        nick_prefix = ''  # Reset nick prefix.
-
-        if word == '':
+    old_nicks = colored_nicks.get(buffer, {}).keys() - nicks.keys()
+
+    # Update the nicks first chars only if the nicks changed.
+    if nicks.keys() != colored_nicks.get(buffer, {}).keys():
+        nick_first_chars[buffer] = count_first_chars(nicks)
+
+    # Reset the buffer dict to update nicks changes, since there is no nicklist
+    # in private buffers.
+    colored_nicks[buffer] = nicks
+
+    if old_nicks:
+        schedule_evict(buffer, old_nicks)
+
+def schedule_evict(buffer, nicks):
+    ''' Schedules the eviction of the cached colors of the nicks removed from
+    buffer.
+
+    Nicks are often removed in bursts (e.g. on part, quit, netsplit or disconnect),
+    so they are evicted at once, 50ms after the first removal. '''
+
+    global evict_timer
+
+    server = w.buffer_get_string(buffer, 'localvar_server') if version == 0x4010000 else ''
+
+    parted_nicks.update((server, nick) for nick in nicks)
+
+    if not evict_timer:
+        evict_timer = w.hook_timer(50, 0, 1, 'evict_timer_cb', '')
+
+def evict_nick_colors(parted):
+    ''' Removes the cached colors of the parted (server, nick), whose nicks are not
+    in any buffer anymore. '''
+
+    nicks = {nick for _, nick in parted}
+
+    # Keep the colors of nicks that are still in some buffer.
+    for buffer_nicks in colored_nicks.values():
+        if not (nicks := {nick for nick in nicks if nick not in buffer_nicks}):
+            break
+
+    for nick in nicks:
+        nick_colors.pop(nick, None)
+
+    # 'irc_nick_color' colors are per server, so keep them if the nick is still in
+    # some buffer of the same server.
+    for server, nick in parted:
+        if not server or (server, nick) not in nick_colors:
             continue
 
-        # Get possible nick from word.
-        if (nick := nicks_rgx.search(word)) is not None:
-            nick = nick.group('nick')
+        if not any(nick in buffer_nicks and w.buffer_get_string(buffer, 'localvar_server') == server
+                   for buffer, buffer_nicks in colored_nicks.items()):
+            del nick_colors[server, nick]
+
+def count_first_chars(nicks):
+    ''' Returns a dict of how many nicks start with each char. '''
+
+    first_chars = {}
+
+    for nick in nicks:
+        if nick:
+            first_chars[nick[0]] = first_chars.get(nick[0], 0) + 1
+
+    return first_chars
+
+def find_nick(nicks, word, prefixes, suffixes):
+    ''' Finds a known nick in the word, with its optional affixes.
+
+    Returns the nick position in the word and the nick; or None if the word is not
+    a nick. The word with its prefix char removed is tried first, then the word as
+    is, since nicks can start with a prefix char; and for each, the longest nick
+    first. '''
+
+    if word[0] in prefixes:
+        if (nick := word[1:]) in nicks:
+            return 1, nick
 
         # If the word is not a known nick and its last character is an option
         # suffix (e.g. colon ':' or comma ','), try to match the word without it.
         # This is necessary as 'foo:' is a valid nick, which could be addressed
         # as 'foo::'.
-        if nick not in colored_nicks[buffer]:
-            if (suffix := sfx_rgx.search(re.escape(nick))) is not None:
-                nick = nick[:-1]
+        if word[-1] in suffixes and (nick := word[1:-1]) in nicks:
+            return 1, nick
 
-        # Nick exists on buffer.
-        if nick in colored_nicks[buffer]:
-            if nick in ignore_nicks or len(nick) < min_len:
-                continue
+    if word in nicks:
+        return 0, word
+
+    if word[-1] in suffixes and (nick := word[:-1]) in nicks:
+        return 0, nick
+
+    return None
+
+def colorize_nicks(buffer, min_len, prefixes, suffixes, line):
+    ''' Finds every nick from the dict of colored nicks, in the line and colorizes
+    them.
 
-            # Get its color.
-            nick_color = colored_nicks[buffer][nick]['color']
+    Returns the colorized line and the list of nick splices, i.e. the positions
+    and colors of every nick match in the line, for preserve_colors(). '''
 
-            # Escape regex meta-chars if any.
-            nick = re.escape(nick)
+    nicks                = colored_nicks[buffer]
+    colorized_nicks_line = ''
+    nick_splices         = []
+    end                  = 0
+
+    # Scan the line once for words, and look up each one in the buffer nicks.
+    for word_match in regex['words'].finditer(line):
+        word = word_match.group()
+
+        if (found := find_nick(nicks, word, prefixes, suffixes)) is None:
+            continue
+
+        pref_len, nick = found
+
+        if nick in ignore_nicks or len(nick) < min_len:
+            continue
+
+        # Get its color and real prefix from nicklist.
+        nick_color, prefix, nick_prefix = nicks[nick]
+
+        # Start positions of word and nick match.
+        start      = word_match.start()
+        nick_start = start + pref_len
 
-            # Find nick in the line.
-            line_rgx = rf'''
-                           (?: \A |  [{HORIZONTAL_WS}])  # Boundary
-                           (?P<pref> [{prefixes}])?      # Optional prefix char
-                           (?P<nick> {nick})
-                           [{suffixes}]?                 # "        suffix char
-                           (?: \Z |  [{HORIZONTAL_WS}])  # Boundary
-                       '''
+        # If the real prefix did not match, the match starts at the nick.
+        if not pref_len or word[0] != prefix:
+            start       = nick_start
+            nick_prefix = ''
 
-            # Nick is found in the line.
-            if (line_match := re.search(line_rgx, chop_line, flags=re.VERBOSE)) is not None:
-                nick = line_match.group('nick')
+        # Concat the string before the match while colorizing the nick, then
+        # update the end position of nick match.
+        colorized_nicks_line += f'{line[end:start]}{nick_prefix}{nick_color}{nick}{COLOR_RESET}'
+        end                   = nick_start + len(nick)
 
-                # In order to prevent the regex engine to needless find the nicks
-                # at previous match positions, preserve the state by chopping the
-                # line at the start and end positions of matches.
+        # Save the nick position in the line, to restore its colors.
+        nick_splices.append((start, nick_start, end, nick_prefix, nick_color))
 
-                # Start position of nick match.
-                start = line_match.start('nick')
+    if colorized_nicks_line:
+        colorized_nicks_line += line[end:]
 
-                # Get the real nick prefix from nicklist.
-                if (pref_match := line_match.group('pref')) is not None:
-                    nick_prefix = colored_nicks[buffer][nick]['prefix']
+    return colorized_nicks_line, nick_splices
 
-                    # If it exists, update the start position match.
-                    if pref_match == w.string_remove_color(nick_prefix, ''):
-                        start = line_match.start('pref')
+def color_code_end(line, pos):
+    ''' Returns the end position of the color code starting at pos, right after
+    the color char (\\x19); or 0 if it is not a valid color code. Same as
+    COLORS_RGX. '''
 
-                        # Mark the prefix with a unique escape to idenfity its
-                        # position on preserve_colors().
-                        if has_colors is not None:
-                            nick_prefix = f'{UNIQ_ESC_PREF}{nick_prefix}'
-                    else:
-                        nick_prefix = ''
+    def digits_end(pos, count):
+        digits = line[pos:pos + count]
 
-                # End position of nick match.
-                end = line_match.end('nick')
+        if len(digits) == count and digits.isascii() and digits.isdigit():
+            return pos + count
 
-                # Chop
-                chop_till_match  = chop_line[:end]
-                chop_after_match = chop_line[end:]
+        return 0
 
-                # Concat the chopped strings while colorizing the nick, then update
-                # the chopped line.
-                nick_str     = f'{nick_prefix}{nick_color}{nick}{nick_end}'
-                color_match += f'{chop_till_match[:start]}{nick_str}{chop_till_match[end:]}'
-                chop_line    = chop_after_match
+    # Fixed 'weechat.color.chat.*' codes
+    if (end := digits_end(pos, 2)):
+        return end
+
+    # Foreground
+    if line.startswith(('F@', '*@'), pos):  # IRC colors (16–99) and WeeChat colors (16–255)
+        pos  += 2
+        count = 5
+    elif line.startswith(('F', '*'), pos):  # IRC colors (00–15)
+        pos  += 1
+        count = 2
+    else:
+        return 0
 
-    if color_match:
-        colorized_nicks_line = f'{color_match}{chop_after_match}'
+    if line.startswith(COLOR_ATTRS, pos):
+        pos += 1
 
-    return colorized_nicks_line
+    if not (pos := digits_end(pos, count)):
+        return 0
 
-def preserve_colors(line, colorized_nicks_line):
+    # Background
+    if line.startswith('~', pos):
+        if (end := digits_end(pos + 1, 2)) or line.startswith('@', pos + 1) and (end := digits_end(pos + 2, 5)):
+            pos = end
+
+    return pos
+
+def tokenize_colors(line):
+    ''' Splits the line into color codes and chars, by yielding (kind, token)
+    tuples; kind is 'color' (colors and attributes), 'reset', 'spell' or 'chars'.
+    Chars between codes are yielded at once as a slice of the line. '''
+
+    pos = 0
+
+    while pos < len(line):
+        # Chars until the next code char.
+        if (code := regex['code_chars'].search(line, pos)) is None:
+            yield 'chars', line[pos:]
+            break
+
+        if code.start() > pos:
+            yield 'chars', line[pos:code.start()]
+            pos = code.start()
+
+        char = line[pos]
+        kind = 'chars'
+        end  = pos + 1
+
+        if char == COLOR_CHAR:
+            if (code_end := color_code_end(line, end)):
+                kind = 'color'
+                end  = code_end
+            elif line.startswith(RES_KEEP, pos):
+                kind = 'color'
+                end  = pos + len(RES_KEEP)
+            elif line.startswith(SPELL_MISS, pos):
+                kind = 'spell'
+                end  = pos + len(SPELL_MISS)
+        elif char in ATTR_CHARS and line.startswith(ATTRS, end):
+            kind = 'color'
+            end += 1
+        elif char == COLOR_RESET:
+            kind = 'reset'
+
+        yield kind, line[pos:end]
+
+        pos = end
+
+def preserve_colors(line, line_nocolor, nick_splices):
     '''
     If the line string is already colored, captures every color code before the nick
     match, for restoration after nick colorizing. Otherwise string colors after the
     nick are reset.
+    The nicks are colorized at the positions of nick_splices from colorize_nicks(),
+    which are positions in the uncolored line.
 
     Testing:
       1. Create an IRC channel.
@@ -600,35 +761,44 @@ def preserve_colors(line, colorized_nicks_line):
          The string is inspired by ##hntop messages and modified to cover some corner cases.
     '''
 
-    new_line      = ''
-    split_line    = []
-    split_line_nc = []
-    color_codes   = ''
-    idx           = 0
-    match         = 0
-
-    # Split all color codes and chars from the lines.
-    split_line    = [x for x in regex['split'].split(line)                 if x is not None and x]
-    split_line_nc = [y for y in regex['split'].split(colorized_nicks_line) if y is not None and y]
-
-    # Since the spell plugin colorizes misspelled strings in the command-line, its
-    # end code must be replaced with reset color + keep attributes when colorize_input
-    # option is set, otherwise it will colorize subsequent strings in the input.
-    if w.config_boolean(config_option['colorize_input']):
-        split_line = [regex['exact_spell'].sub(rf'{RES_KEEP_RGX}', z) if not None else z for z in split_line]
-
-    # Debug split lists.
-    #w.prnt('', f'split_line:'    + pp.pformat(split_line))
-    #w.prnt('', f'split_line_nc:' + pp.pformat(split_line_nc))
-
-    # Iterate through the original split list, comparing every char against the
-    # uncolored list; while reconstructing the new line with saved color codes.
-    for i in split_line:
-        #w.prnt('', f'i: ' + pp.pformat(f'{i}'))
-        #w.prnt('', f"split_line_nc[{idx}]: " + pp.pformat(f'{split_line_nc[idx]}'))
+    new_line    = ''
+    color_codes = ''
+    pos         = 0  # Position in the uncolored line
+    match       = 0
+    events      = []
+
+    # Positions in the uncolored line where the nick matches change colors.
+    for start, nick_start, end, nick_prefix, nick_color in nick_splices:
+        if nick_prefix:
+            events.append((start, 'prefix', nick_prefix))
+
+        events.append((nick_start, 'nick', nick_color))
+        events.append((end, 'end', ''))
+
+    events   = iter(events)
+    no_event = (len(line_nocolor), '', '')
+
+    # Position of the first event.
+    event_pos, event, code = next(events, no_event)
+
+    # Iterate through the color codes and chars of the line once, counting the chars
+    # of the uncolored line; while reconstructing the new line with saved color codes.
+    for kind, i in tokenize_colors(line):
+        #w.prnt('', f'{kind}: ' + pp.pformat(f'{i}'))
+
+        # Since the spell plugin colorizes misspelled strings in the command-line, its
+        # end code must be replaced with reset color + keep attributes when colorize_input
+        # option is set, otherwise it will colorize subsequent strings in the input.
+        if kind == 'spell':
+            if not config_val['colorize_input']:
+                new_line += i
+                continue
+
+            kind = 'color'
+            i    = RES_KEEP
 
         # It is a color code, so append its codes to be restored.
-        if regex['is_color'].search(i) is not None:
+        if kind == 'color':
             color_codes += i
             #w.prnt('', f'color_codes: ' + pp.pformat(f'{color_codes}'))
 
@@ -638,53 +808,43 @@ def preserve_colors(line, colorized_nicks_line):
 
             continue
         # Remove saved codes if a reset code is found.
-        elif i == COLOR_RESET:
+        elif kind == 'reset':
             if not match:
                 new_line += i
 
             color_codes = ''
             continue
-        elif 0 <= idx < len(split_line_nc):
-            # It is a char, so compare it against the uncolored's char.
-            if i == split_line_nc[idx]:
-                new_line += i
-                idx      += 1
-
-                continue
-            # If the char is in a nick match and uncolored's is a unique nick
-            # escape code, restore the saved codes, then advance the index.
-            elif match and split_line_nc[idx] == UNIQ_ESC_NICK:
-                #w.prnt('', f"split_line_nc[{idx} + 1]: " + pp.pformat(f'{split_line_nc[idx + 1]}'))
-
-                # If the chars match, advance the index.
-                if split_line_nc[idx + 1] == i:
-                    new_line += f'{COLOR_RESET}{color_codes}{i}'
-                    idx      += 2
-                    match     = 0
-
-                    continue
-            # It is a unique prefix escape code, so get its color code and char,
-            # then advance uncolored's index to the start of colorized nick match.
-            elif split_line_nc[idx] == UNIQ_ESC_PREF:
-                prefix    = f'{split_line_nc[idx + 1]}{i}'
-                new_line += prefix
-                idx      += 3
-
-                continue
-            # It is the start of a colorized nick match, so colorize the new line,
-            # then advance uncolored's index to the current char.
-            elif (split_match := regex['exact_color'].search(split_line_nc[idx])) is not None:
-                #w.prnt('', f"split_line_nc[{idx} + 1]: " + pp.pformat(f'{split_line_nc[idx + 1]}'))
 
-                nick_color  = split_match.group(0)
-                idx        += 1
-                new_line   += f'{COLOR_RESET}{nick_color}{split_line_nc[idx]}'
-                match       = 1
-
-                # If the chars match, advance the index.
-                if i == split_line_nc[idx]:
-                    idx += 1
-                    continue
+        # Leading chars that are not in the uncolored line are the rest of a code
+        # unknown to the tokenizer, so keep them as is.
+        while i and not line_nocolor.startswith(i, pos):
+            new_line += i[0]
+            i         = i[1:]
+
+        idx = 0  # Start of the chars not appended yet
+
+        # Colorize the nick matches whose events are inside the chars.
+        while event_pos < pos + len(i):
+            char_idx  = event_pos - pos
+            new_line += i[idx:char_idx]
+
+            # It is the prefix of a nick match, so replace it with the colored prefix.
+            if event == 'prefix':
+                new_line += code
+            # It is the start of a nick match, so colorize the new line.
+            elif event == 'nick':
+                new_line += f'{COLOR_RESET}{code}{i[char_idx]}'
+                match     = 1
+            # It is the char after a nick match, so restore the saved codes.
+            else:
+                new_line += f'{COLOR_RESET}{color_codes}{i[char_idx]}'
+                match     = 0
+
+            idx = char_idx + 1
+            event_pos, event, code = next(events, no_event)
+
+        new_line += i[idx:]
+        pos      += len(i)
 
     return new_line
 
@@ -694,10 +854,9 @@ def init_colorize(buffer, message):
     colorized_nicks_msg = ''
     new_msg             = ''
 
-    # Get options.
-    min_len      = w.config_integer(config_option['min_nick_length'])
-    pref_charset = re.escape(w.config_string(config_option['nick_prefixes']))
-    suff_charset = re.escape(w.config_string(config_option['nick_suffixes']))
+    # No char of message starts a nick, so there is nothing to colorize.
+    if nick_first_chars[buffer].keys().isdisjoint(message):
+        return message
 
     # Check if message has color codes.
     has_colors = regex['has_colors'].search(message)
@@ -706,11 +865,25 @@ def init_colorize(buffer, message):
     msg_nocolor = w.string_remove_color(message, '')
 
     # Find and colorize the nicks.
-    colorized_nicks_msg = colorize_nicks(buffer, min_len, pref_charset, suff_charset, has_colors, msg_nocolor)
+    colorized_nicks_msg, nick_splices = colorize_nicks(buffer, config_val['min_nick_length'], config_val['nick_prefixes'], config_val['nick_suffixes'], msg_nocolor)
 
     # Preserve colors from message.
-    if has_colors is not None and colorized_nicks_msg:
-        new_msg = preserve_colors(message, colorized_nicks_msg)
+    if has_colors is not None and nick_splices:
+        first_code = regex['code_chars'].search(message).start()
+
+        # All nick matches end before the first code, so there are no colors to
+        # restore in them; append the rest of message as is to the colorized part.
+        if nick_splices[-1][2] < first_code:
+            colorized_len = len(colorized_nicks_msg) - len(msg_nocolor) + first_code
+            msg_codes     = message[first_code:]
+
+            # Replace the spell plugin end code, as in preserve_colors().
+            if config_val['colorize_input']:
+                msg_codes = msg_codes.replace(SPELL_MISS, RES_KEEP)
+
+            new_msg = f'{colorized_nicks_msg[:colorized_len]}{msg_codes}'
+        else:
+            new_msg = preserve_colors(message, msg_nocolor, nick_splices)
 
     # Debug the message string.
     #debug_str('message', message)
@@ -754,41 +927,48 @@ def colorize_cb(data, hashtable):
     message   = hashtable['message']
 
     plugin  = w.buffer_get_string(buffer, 'localvar_plugin')
-    bufname = w.buffer_get_string(buffer, 'localvar_name')
     buftype = w.buffer_get_string(buffer, 'localvar_type')
-    channel = w.buffer_get_string(buffer, 'localvar_channel')
 
-    irc_only = w.config_boolean(config_option['irc_only'])
+    irc_only = config_val['irc_only']
+
+    # The lines that are not colorized return an empty dict, so weechat has no
+    # keys to update.
+
+    # Ignore non IRC messages if config asks.
+    if irc_only and plugin != 'irc':
+        return {}
 
     # Colorize only IRC user messages.
-    if plugin == 'irc' or irc_only and plugin != 'irc':
+    if plugin == 'irc':
         # There is no point in colorizing non channel/private buffers, and IRC
         # tags other than 'irc_privmsg/notice', since tags i.e. irc_join/part/quit
         # are already colored.
-        if buftype != 'channel' and buftype != 'private' or tags[0] != 'irc_privmsg' and tags[0] != 'irc_notice':
-            return hashtable
+        if buftype not in BUFTYPES or tags[0] not in PRIVMSG_TAGS:
+            return {}
 
     # Colorize nicks on IRC private buffers.
     if plugin == 'irc' and buftype == 'private':
         colorize_priv_nicks(buffer)
 
+    # The checks go from the cheapest to the costliest, so most rejected lines
+    # return early.
+
     # Check if buffer has colorized nicks.
     if not colored_nicks.get(buffer):
-        return hashtable
+        return {}
 
-    # Check if channel is ignored.
-    if channel and channel in ignore_channels:
-        return hashtable
+    # Do not colorize if message is filtered.
+    if displayed == '0' and not config_val['colorize_filter']:
+        return {}
 
     # Do not colorize if an ignored tag is present in message.
-    tag_ignores = w.config_string(config_option['ignore_tags']).split(',')
-    for tag in tags:
-        if tag in tag_ignores:
-            return hashtable
+    if not ignore_tags.isdisjoint(tags):
+        return {}
 
-    # Do not colorize if message is filtered.
-    if displayed == '0' and not w.config_boolean(config_option['colorize_filter']):
-        return hashtable
+    # Check if channel is ignored.
+    channel = w.buffer_get_string(buffer, 'localvar_channel')
+    if channel and channel in ignore_channels:
+        return {}
 
     # Init colorizing process.
     message = init_colorize(buffer, message)
@@ -802,7 +982,7 @@ def colorize_cb(data, hashtable):
 def colorize_input_cb(data, modifier, modifier_data, line):
     ''' Callback that does the colorizing of nicks from weechat's input. '''
 
-    if not w.config_boolean(config_option['colorize_input']):
+    if not config_val['colorize_input']:
         return line
 
     buffer  = w.current_buffer()
@@ -810,13 +990,17 @@ def colorize_input_cb(data, modifier, modifier_data, line):
     buftype = w.buffer_get_string(buffer, 'localvar_type')
     channel = w.buffer_get_string(buffer, 'localvar_channel')
 
-    irc_only         = w.config_boolean(config_option['irc_only'])
-    irc_decode_input = w.config_boolean(config_option['irc_decode_input'])
+    irc_only         = config_val['irc_only']
+    irc_decode_input = config_val['irc_decode_input']
+
+    # Ignore non IRC messages if config asks.
+    if irc_only and plugin != 'irc':
+        return line
 
     # Colorize only IRC user messages.
-    if plugin == 'irc' or irc_only and plugin != 'irc':
+    if plugin == 'irc':
         # There is no point in colorizing non channel/private buffers.
-        if buftype != 'channel' and buftype != 'private':
+        if buftype not in BUFTYPES:
             return line
 
     # Check if current buffer has colorized nicks.
@@ -842,64 +1026,132 @@ def populate_nicks_cb(*args):
 
     if colored_nicks:
         colored_nicks.clear()
+        nick_first_chars.clear()
+
+    # The prefixes colors may have changed.
+    colored_prefixes.clear()
 
-    prefix_color = ''
-    nick_prefix  = ''
-    irc_only     = w.config_boolean(config_option['irc_only'])
+    irc_only = config_val['irc_only']
 
     hdata_buf     = w.hdata_get('buffer')
     hdata_nick    = w.hdata_get('nick')
     hdata_nickgrp = w.hdata_get('nick_group')
 
+    # Bind the API functions called for every nick to locals, to skip the module
+    # attribute lookups.
+    hdata_string      = w.hdata_string
+    hdata_pointer     = w.hdata_pointer
+    hdata_move        = w.hdata_move
+    buffer_get_string = w.buffer_get_string
+
     # Get list of buffers.
     if not (buffers := w.hdata_get_list(hdata_buf, 'gui_buffers')):
         w.prnt('', f'{SCRIPT_NAME}\tfailed to get list of buffers')
         return ERR
 
     while buffers:
-        channel      = w.buffer_get_string(buffers, 'localvar_channel')
-        plugin       = w.buffer_get_string(buffers, 'localvar_plugin')
-        nicklist_ptr = w.hdata_pointer(hdata_buf, buffers, 'nicklist_root')
-        children     = w.hdata_pointer(hdata_nickgrp, nicklist_ptr, 'children')
+        # The buffer channel does not change, so check only once per buffer if it
+        # is an IRC channel.
+        if (is_channel := irc_channels.get(buffers)) is None:
+            channel    = buffer_get_string(buffers, 'localvar_channel')
+            is_channel = irc_channels[buffers] = bool(w.info_get('irc_is_channel', channel))
 
         # Skip non-IRC channel buffers.
-        if irc_only and not plugin == 'irc' or not w.info_get('irc_is_channel', channel):
-            buffers = w.hdata_move(hdata_buf, buffers, 1)
+        if not is_channel or irc_only and buffer_get_string(buffers, 'localvar_plugin') != 'irc':
+            buffers = hdata_move(hdata_buf, buffers, 1)
             continue
 
-        my_nick = w.buffer_get_string(buffers, 'localvar_nick')
+        nicklist_ptr = hdata_pointer(hdata_buf, buffers, 'nicklist_root')
+        children     = hdata_pointer(hdata_nickgrp, nicklist_ptr, 'children')
+        my_nick      = buffer_get_string(buffers, 'localvar_nick')
+        buffer_nicks = colored_nicks.setdefault(buffers, {})
 
         # Nick groups
         while children:
-            child = w.hdata_pointer(hdata_nickgrp, children, 'nicks')
+            child = hdata_pointer(hdata_nickgrp, children, 'nicks')
 
             # Nicks
             while child:
-                if buffers not in colored_nicks:
-                    colored_nicks[buffers] = {}
-
                 # Get nicks colors.
-                nick       = w.hdata_string(hdata_nick, child, 'name')
+                nick       = hdata_string(hdata_nick, child, 'name')
                 nick_color = get_nick_color(buffers, nick, my_nick)
 
                 # Get nicks prefixes.
-                prefix = w.hdata_string(hdata_nick, child, 'prefix')
+                prefix = hdata_string(hdata_nick, child, 'prefix')
                 if prefix != SPACE:
-                    prefix_color = w.color(w.hdata_string(hdata_nick, child, 'prefix_color'))
-                    nick_prefix  = f'{prefix_color}{prefix}'
+                    nick_prefix = get_nick_prefix(prefix, hdata_string(hdata_nick, child, 'prefix_color'))
+                else:
+                    prefix      = ''
+                    nick_prefix = ''
 
                 # Populate
-                colored_nicks[buffers][nick] = {
-                        'color':  nick_color,
-                        'prefix': nick_prefix,
-                }
-                nick_prefix = ''
+                buffer_nicks[nick] = (nick_color, prefix, nick_prefix)
+
+                child = hdata_move(hdata_nick, child, 1)
+
+            children = hdata_move(hdata_nickgrp, children, 1)
+
+        # Count the buffer nicks first chars once all its nicks are in.
+        nick_first_chars[buffers] = count_first_chars(buffer_nicks)
+
+        buffers = hdata_move(hdata_buf, buffers, 1)
+
+    #w.prnt('', 'colored_nicks:\n' + pp.pformat(colored_nicks))
+
+    return OK
+
+def populate_timer_cb(data, remaining_calls):
+    ''' Callback that repopulates the colored nicks, when the timer set by
+    schedule_populate_cb() fires. '''
+
+    global populate_timer
+
+    populate_timer = ''
+
+    return populate_nicks_cb()
+
+def evict_timer_cb(data, remaining_calls):
+    ''' Callback that evicts the cached colors of the parted nicks, when the timer
+    set by schedule_evict() fires. '''
+
+    global evict_timer
+
+    evict_timer = ''
+
+    evict_nick_colors(parted_nicks)
+    parted_nicks.clear()
+
+    return OK
+
+def schedule_populate_cb(data, option, value):
+    ''' Callback that schedules a repopulate of the colored nicks, when the nick
+    prefixes colors change.
+
+    The delay lets the IRC plugin update the nicklist prefixes colors first, and
+    coalesces the changes within 50ms (e.g. from /reload) into a single walk of
+    the nicklists. '''
+
+    global populate_timer
+
+    if not populate_timer:
+        populate_timer = w.hook_timer(50, 0, 1, 'populate_timer_cb', '')
+
+    return OK
+
+def recolor_nicks_cb(data, option, value):
+    ''' Callback that clears the cached nick colors and recolors the colored nicks
+    in place, when weechat's nick colors options change.
 
-                child = w.hdata_move(hdata_nick, child, 1)
+    The nicks and prefixes are the same, so there is no need to walk the nicklists
+    again. '''
 
-            children = w.hdata_move(hdata_nickgrp, children, 1)
+    nick_colors.clear()
 
-        buffers = w.hdata_move(hdata_buf, buffers, 1)
+    for buffer, nicks in colored_nicks.items():
+        my_nick = w.buffer_get_string(buffer, 'localvar_nick')
+
+        for nick, (_, prefix, nick_prefix) in nicks.items():
+            nicks[nick] = (get_nick_color(buffer, nick, my_nick), prefix, nick_prefix)
 
     #w.prnt('', 'colored_nicks:\n' + pp.pformat(colored_nicks))
 
@@ -912,27 +1164,30 @@ def add_nick_cb(data, signal, signal_data):
     # Nicks can have ',' in them in some protocols.
     buffer, nick = signal_data.split(',', maxsplit=1)
 
-    if buffer not in colored_nicks:
-        colored_nicks[buffer] = {}
-
     # Get nick color.
     my_nick    = w.buffer_get_string(buffer, 'localvar_nick')
     nick_color = get_nick_color(buffer, nick, my_nick)
 
     # Get nick prefix.
+    prefix      = ''
     nick_prefix = ''
     if (nick_ptr := w.nicklist_search_nick(buffer, '', nick)):
         prefix = w.nicklist_nick_get_string(buffer, nick_ptr, 'prefix')
 
         if prefix != SPACE:
-            prefix_color = w.color(w.nicklist_nick_get_string(buffer, nick_ptr, 'prefix_color'))
-            nick_prefix  = f'{prefix_color}{prefix}'
+            nick_prefix = get_nick_prefix(prefix, w.nicklist_nick_get_string(buffer, nick_ptr, 'prefix_color'))
+        else:
+            prefix = ''
 
     # Update
-    colored_nicks[buffer][nick] = {
-            'color':  nick_color,
-            'prefix': nick_prefix,
-    }
+    nicks = colored_nicks.setdefault(buffer, {})
+
+    # Count the first char of a new nick.
+    if nick not in nicks and nick:
+        first_chars          = nick_first_chars.setdefault(buffer, {})
+        first_chars[nick[0]] = first_chars.get(nick[0], 0) + 1
+
+    nicks[nick] = (nick_color, prefix, nick_prefix)
 
     #w.prnt('', 'colored_nicks:\n' + pp.pformat(colored_nicks))
 
@@ -945,37 +1200,59 @@ def remove_nick_cb(data, signal, signal_data):
     # Nicks can have ',' in them in some protocols.
     buffer, nick = signal_data.split(',', maxsplit=1)
 
-    if buffer in colored_nicks and nick in colored_nicks[buffer]:
-        del colored_nicks[buffer][nick]
+    if (nicks := colored_nicks.get(buffer)) is not None and nicks.pop(nick, None) is not None and nick:
+        first_chars = nick_first_chars[buffer]
+
+        # Uncount its first char.
+        if (count := first_chars[nick[0]] - 1):
+            first_chars[nick[0]] = count
+        else:
+            del first_chars[nick[0]]
+
+        schedule_evict(buffer, (nick,))
 
     #w.prnt('', 'colored_nicks:\n' + pp.pformat(colored_nicks))
 
     return OK
 
-def remove_priv_buffer_cb(data, signal, buffer):
-    ''' Callback that removes an IRC private buffer from the dict of colored nicks,
-    when the buffer is closing. '''
+def remove_buffer_cb(data, signal, buffer):
+    ''' Callback that removes a buffer from the dict of colored nicks, when the
+    buffer is closing. '''
 
-    # For some reason, weechat crashes if the hook signal is set to 'buffer_closed'
-    # while trying to get the 'localvar_*' strings.
-    # Perhaps the buffer pointer is not valid anymore because it was closed?
-    plugin  = w.buffer_get_string(buffer, 'localvar_plugin')
-    buftype = w.buffer_get_string(buffer, 'localvar_type')
+    if (nicks := colored_nicks.pop(buffer, None)) is not None:
+        nick_first_chars.pop(buffer, None)
+        schedule_evict(buffer, nicks)
 
-    if plugin == 'irc' and buftype == 'private' and buffer in colored_nicks:
-        del colored_nicks[buffer]
+    irc_channels.pop(buffer, None)
 
     #w.prnt('', 'colored_nicks:\n' + pp.pformat(colored_nicks))
 
     return OK
 
+def update_options_cb(*args):
+    ''' Callback that caches the options values, so they are not fetched from
+    weechat on every message. The ignore options are kept as sets by
+    update_blacklist_cb(). '''
+
+    for option in 'colorize_filter', 'colorize_input', 'irc_decode_input', 'irc_only':
+        config_val[option] = w.config_boolean(config_option[option])
+
+    for option in 'nick_prefixes', 'nick_suffixes':
+        config_val[option] = w.config_string(config_option[option])
+
+    config_val['min_nick_length'] = w.config_integer(config_option['min_nick_length'])
+
+    return OK
+
 def update_blacklist_cb(*args):
-    ''' Callback that sets the blacklist for channels and nicks. '''
+    ''' Callback that sets the blacklist for channels, nicks and tags. '''
 
-    global ignore_channels, ignore_nicks
+    global ignore_channels, ignore_nicks, ignore_tags
 
-    ignore_channels = w.config_string(config_option['ignore_channels']).split(',')
-    ignore_nicks    = w.config_string(config_option['ignore_nicks']).split(',')
+    # Drop empty strings, so an empty option does not match empty values.
+    ignore_channels = frozenset(filter(None, w.config_string(config_option['ignore_channels']).split(',')))
+    ignore_nicks    = frozenset(filter(None, w.config_string(config_option['ignore_nicks']).split(',')))
+    ignore_tags     = frozenset(filter(None, w.config_string(config_option['ignore_tags']).split(',')))
 
     return OK
 
@@ -993,8 +1270,11 @@ if __name__ == '__main__':
         config_read()
         compile_regexes()
 
+        version = int(w.info_get('version_number', '') or 0)
+
         # Run once to get data ready.
         update_blacklist_cb()
+        update_options_cb()
         populate_nicks_cb()
 
         # Hooks
@@ -1006,12 +1286,18 @@ if __name__ == '__main__':
         # Update nicks.
         w.hook_signal('nicklist_nick_added', 'add_nick_cb', '')
         w.hook_signal('nicklist_nick_removed', 'remove_nick_cb', '')
-        w.hook_signal('buffer_closing', 'remove_priv_buffer_cb', '')
+        w.hook_signal('buffer_closing', 'remove_buffer_cb', '')
 
-        # Repopulate nicks on colors changes from weechat's options.
-        w.hook_config('weechat.color.chat_nick_colors', 'populate_nicks_cb', '')
-        w.hook_config('weechat.look.nick_color_hash', 'populate_nicks_cb', '')
-        w.hook_config('irc.color.nick_prefixes', 'populate_nicks_cb', '')
+        # Recolor nicks on colors changes from weechat's options.
+        w.hook_config('weechat.color.chat_nick_colors', 'recolor_nicks_cb', '')
+        w.hook_config('weechat.color.chat_nick_self', 'recolor_nicks_cb', '')
+        w.hook_config('weechat.look.nick_color_*', 'recolor_nicks_cb', '')
+
+        # Repopulate nicks on prefixes colors changes, which are read from nicklist.
+        w.hook_config('irc.color.nick_prefixes', 'schedule_populate_cb', '')
 
         # Update blacklists.
         w.hook_config(f'{SCRIPT_NAME}.look.ignore_*', 'update_blacklist_cb', '')
+
+        # Update cached options.
+        w.hook_config(f'{SCRIPT_NAME}.look.*', 'update_options_cb', '')